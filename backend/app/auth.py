@@ -1,41 +1,96 @@
-from datetime import datetime, timedelta
+import hashlib
+import threading
+import time
+from datetime import timedelta
 from typing import Optional
 
+import anyio
+import jwt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from passlib.context import CryptContext
 
 from .config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 ALGORITHM = "HS256"
+_SECRET_B = settings.secret_key.encode()
+_DEFAULT_EXPIRE_SECONDS = settings.token_exp_minutes * 60
 
+# Decoded payloads keyed by a digest of the bearer token, so repeated requests
+# with the same token skip signature verification. Entries never outlive "exp".
+_jwt_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
+_jwt_cache_lock = threading.Lock()
 
-def authenticate_client(username: str, password: str) -> bool:
-    return username in settings.users and settings.users[username] == password
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+# Hashed client passwords, filled from settings.users by load_client_credentials()
+_USERS_HASHED: dict[str, str] = {}
+_DUMMY_HASH: Optional[str] = None
+
+
+def load_client_credentials() -> None:
+    """Hash configured client passwords once so login never compares plaintext"""
+    global _DUMMY_HASH
+    _USERS_HASHED.clear()
+    _USERS_HASHED.update({u: pwd_context.hash(p) for u, p in settings.users.items()})
+    _DUMMY_HASH = pwd_context.hash("dummy-password")
+
+
+async def authenticate_client(username: str, password: str) -> bool:
+    # bcrypt releases the GIL, so verifying in worker threads lets logins run in parallel
+    stored = _USERS_HASHED.get(username)
+    if stored is None:
+        # Unknown user: still run one verify so response time does not reveal it
+        await anyio.to_thread.run_sync(pwd_context.verify, password, _DUMMY_HASH)
+        return False
+    return await anyio.to_thread.run_sync(pwd_context.verify, password, stored)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.token_exp_minutes))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    now = int(time.time())
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else _DEFAULT_EXPIRE_SECONDS
+    to_encode.update({"exp": now + lifetime, "iat": now})
+    encoded_jwt = jwt.encode(to_encode, _SECRET_B, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def _looks_like_jwt(token: str) -> bool:
+    # "eyJ" is the base64url encoding of '{"', the start of every JWT header
+    return token.count(".") == 2 and len(token) < 8192 and token.startswith("eyJ")
+
+
+def _verify_cached(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+
+    # PyJWTError propagates to the caller and is never cached
+    payload = jwt.decode(token, _SECRET_B, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    with _jwt_cache_lock:
+        _jwt_cache[key] = payload
+    return payload
+
+
 def get_current_client(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not _looks_like_jwt(token):
+        raise credentials_exception
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        payload = _verify_cached(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
     if username not in settings.users:
         raise credentials_exception
@@ -4,7 +4,13 @@ from contextlib import contextmanager
 from .config import settings
 
 
-engine = create_engine(settings.database_url, echo=True, pool_pre_ping=True)
+engine = create_engine(
+    settings.database_url,
+    echo=settings.sql_echo,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+)
 
 
 def init_db() -> None:
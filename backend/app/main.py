@@ -1,16 +1,20 @@
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, List, Optional
 from uuid import uuid4
-import shutil
+import hashlib
 import logging
+import shutil
 
+import aiofiles
 import astropy.units as u
 from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import Session, select
 from sqlmodel import delete
+from sqlalchemy import text
 from fastapi.security import OAuth2PasswordRequestForm
 
 # Логгер для модуля
@@ -21,7 +25,9 @@ from .database import get_session, init_db
 from .models import Observation, OrbitSolution
 from .orbit import derive_orbit, find_closest_approach
 from .schemas import ClosestApproach, ComputeResponse, ObservationRead, OrbitElements
-from .auth import authenticate_client, create_access_token, get_current_client
+from .auth import authenticate_client, create_access_token, get_current_client, load_client_credentials
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 app = FastAPI(title="Comet Orbit Lab")
 
@@ -33,21 +39,85 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/uploads", StaticFiles(directory=settings.upload_dir), name="uploads")
+# The upload directory is created in on_startup, so skip the import-time existence check
+app.mount("/uploads", StaticFiles(directory=settings.upload_dir, check_dir=False), name="uploads")
 
 
 @app.on_event("startup")
 def on_startup():
+    settings.upload_dir.mkdir(parents=True, exist_ok=True)
     init_db()
+    load_client_credentials()
+    # FastAPI caches the result in app.openapi_schema, so the first /docs hit doesn't build it
+    app.openapi()
+
+
+def _lock_photo(session: Session, filename: str) -> None:
+    """Serializes create/delete of one content-addressed photo until the transaction ends"""
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": filename})
+
+
+def _unlink_unreferenced_photo(session: Session, filename: str, photo_path: Path) -> None:
+    """Removes the photo file if no observation in this transaction's view still uses it"""
+    _lock_photo(session, filename)
+    shared = session.exec(
+        select(Observation.id).where(Observation.photo_filename == filename)
+    ).first()
+    if shared is not None:
+        return
+    try:
+        photo_path.unlink(missing_ok=True)
+    except Exception as e:
+        logger.warning("Failed to remove photo file %s: %s", photo_path, e)
+
+
+def _store_observation(
+    session: Session, observation: Observation, tmp_path: Optional[Path], upload: BinaryIO
+) -> Observation:
+    """Puts the photo in place and inserts the row while holding the photo lock.
+
+    Blocks on the lock, so create_observation runs it in the threadpool.
+    """
+    destination = Path(observation.photo_path)
+    created = False
+    _lock_photo(session, observation.photo_filename)
+    try:
+        if destination.exists():
+            # Another upload of the same photo got here first, or our existence check was stale
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+        elif tmp_path is not None:
+            tmp_path.replace(destination)
+            created = True
+        else:
+            # A concurrent delete removed the file after our existence check; restore it
+            upload.seek(0)
+            with destination.open("wb") as dest_file:
+                shutil.copyfileobj(upload, dest_file, UPLOAD_CHUNK_SIZE)
+            created = True
+
+        session.add(observation)
+        session.commit()
+    except Exception:
+        session.rollback()
+        if created:
+            # Don't leave a file no row points to; another upload may have claimed it meanwhile
+            _unlink_unreferenced_photo(session, observation.photo_filename, destination)
+            session.commit()
+        raise
+
+    session.refresh(observation)
+    return observation
 
 
 def _photo_url(obs: Observation) -> str:
-    path = Path(obs.photo_path).name
-    return f"/uploads/{path}"
+    return f"/uploads/{obs.photo_filename}"
 
 
 def _to_read(obs: Observation) -> ObservationRead:
-    return ObservationRead(
+    # Rows come from our own DB, so skip pydantic validation
+    return ObservationRead.model_construct(
         id=obs.id,
         ra_hours=obs.ra_hours,
         dec_degrees=obs.dec_degrees,
@@ -71,33 +141,49 @@ async def create_observation(
     if photo.content_type and not photo.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Фото должно быть изображением.")
 
+    tmp_path = None
     try:
-        filename = f"{uuid4().hex}_{photo.filename}"
+        # First pass: hash the upload (already spooled by Starlette) and enforce the size limit
+        digest = hashlib.sha256()
+        total = 0
+        while chunk := await photo.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > settings.max_upload_bytes:
+                raise HTTPException(status_code=413, detail="Фото слишком большое.")
+            digest.update(chunk)
+
+        # Content-addressed name: identical photos share one file on disk
+        filename = f"{digest.hexdigest()}{Path(photo.filename or '').suffix.lower()}"
+        # upload_dir is created in on_startup
         destination = settings.upload_dir / filename
 
-        # Ensure upload directory exists
-        settings.upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Save the file
-        with destination.open("wb") as dest_file:
-            shutil.copyfileobj(photo.file, dest_file)
+        if not destination.exists():
+            # Write to a temp name and rename, so a half-written file is never served
+            tmp_path = settings.upload_dir / f".{uuid4().hex}.part"
+            await photo.seek(0)
+            async with aiofiles.open(tmp_path, "wb") as dest_file:
+                while chunk := await photo.read(UPLOAD_CHUNK_SIZE):
+                    await dest_file.write(chunk)
 
         observation = Observation(
             ra_hours=ra_hours,
             dec_degrees=dec_degrees,
             observation_time=observation_time,
             photo_path=str(destination),
+            photo_filename=filename,
             username=username,
         )
-
-        session.add(observation)
-        session.commit()
-        session.refresh(observation)
+        observation = await run_in_threadpool(_store_observation, session, observation, tmp_path, photo.file)
 
         logger.info(f"Successfully created observation {observation.id} for user {username}")
         return _to_read(observation)
 
+    except HTTPException:
+        raise
     except Exception as e:
+        # Don't leave a partial temp file behind; after the rename it no longer exists
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
         logger.error(f"Error creating observation: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка при создании наблюдения: {str(e)}")
 
@@ -107,12 +193,13 @@ def list_observations(
     session: Session = Depends(get_session),
     username: str = Depends(get_current_client)
 ):
-    # Filter observations by username
+    # Filter observations by username; rows are fetched and hydrated in batches
     observations = session.exec(
         select(Observation)
         .where(Observation.username == username)
         .order_by(Observation.observation_time)
-    ).all()
+        .execution_options(yield_per=100)
+    )
     return [_to_read(obs) for obs in observations]
 
 
@@ -130,15 +217,11 @@ def delete_observation(
     if obs.username != username:
         raise HTTPException(status_code=403, detail="Нет прав на удаление этого наблюдения")
 
-    # Try to delete photo file if exists
-    try:
-        photo_path = Path(obs.photo_path)
-        if photo_path.exists():
-            photo_path.unlink()
-    except Exception as e:
-        logger.warning("Failed to remove photo file %s: %s", getattr(photo_path, 'as_posix', lambda: str(photo_path))(), e)
-
     session.delete(obs)
+    session.flush()
+    # Photos are content-addressed, so the file may be shared with other observations;
+    # the lock keeps a concurrent upload of the same photo from reusing it while we unlink
+    _unlink_unreferenced_photo(session, obs.photo_filename, Path(obs.photo_path))
     session.commit()
     return None
 
@@ -148,9 +231,14 @@ def compute_orbit(
     session: Session = Depends(get_session),
     username: str = Depends(get_current_client)
 ):
-    # Get only current user's observations
+    # Get only current user's observations; only the columns the orbit fit needs
     observations = session.exec(
-        select(Observation)
+        select(
+            Observation.id,
+            Observation.ra_hours,
+            Observation.dec_degrees,
+            Observation.observation_time,
+        )
         .where(Observation.username == username)
         .order_by(Observation.observation_time)
     ).all()
@@ -180,6 +268,7 @@ def compute_orbit(
         relative_speed_kms=rel_speed,
     )
 
+    observation_ids = [obs.id for obs in observations]
     solution = OrbitSolution(
         semi_major_axis_au=orbit_data.semi_major_axis_au,
         eccentricity=orbit_data.eccentricity,
@@ -190,15 +279,16 @@ def compute_orbit(
         closest_approach_time=closest.datetime,
         closest_distance_km=closest.distance_km,
         relative_speed_kms=closest.relative_speed_kms,
-        source_observation_ids=",".join(str(obs.id) for obs in observations),
+        source_observation_ids=observation_ids,
     )
     session.add(solution)
     session.commit()
 
-    return ComputeResponse(
+    # Parts are already validated models and ids come from the DB, so skip re-validation
+    return ComputeResponse.model_construct(
         orbit=orbit_data,
         closest_approach=closest,
-        observation_ids=[obs.id for obs in observations],
+        observation_ids=tuple(observation_ids),
     )
 
 
@@ -207,34 +297,34 @@ def reset_database(session: Session = Depends(get_session), username: str = Depe
     """Удаляет все наблюдения и решения орбит из БД и очищает папку с загрузками.
     ВНИМАНИЕ: операция необратима.
     """
-    # Удаляем строки из таблиц
-    session.exec(delete(OrbitSolution))
-    session.exec(delete(Observation))
+    # Очищаем обе таблицы в одной транзакции; в PostgreSQL — одним TRUNCATE
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("TRUNCATE TABLE orbitsolution, observation"))
+    else:
+        session.exec(delete(OrbitSolution))
+        session.exec(delete(Observation))
     session.commit()
 
-    # Очищаем папку uploads на хосте/в контейнере
+    # Очищаем папку uploads целиком и создаём её заново
+    upload_dir = settings.upload_dir
+
+    def _log_rmtree_error(func, path, exc_info):
+        # The directory itself can be a bind mount that can't be removed; that's expected
+        if Path(path) != upload_dir:
+            logger.warning("Failed to remove upload path %s: %s", path, exc_info[1])
+
+    shutil.rmtree(upload_dir, onerror=_log_rmtree_error)
     try:
-        upload_dir = settings.upload_dir
-        for child in upload_dir.iterdir():
-            try:
-                if child.is_file() or child.is_symlink():
-                    child.unlink()
-                elif child.is_dir():
-                    # рекурсивно удалить директорию
-                    import shutil as _sh
-
-                    _sh.rmtree(child)
-            except Exception as e:
-                logger.warning("Failed to remove upload file %s: %s", child, e)
+        upload_dir.mkdir(parents=True, exist_ok=True)
     except Exception as e:
-        logger.exception("Failed to clean upload directory: %s", e)
+        logger.exception("Failed to recreate upload directory: %s", e)
 
     return {"status": "ok", "message": "Database and uploads cleared"}
 
 
 @app.post('/login')
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    if not authenticate_client(form_data.username, form_data.password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    if not await authenticate_client(form_data.username, form_data.password):
         raise HTTPException(status_code=400, detail='Incorrect username or password')
     access_token = create_access_token(data={"sub": form_data.username})
     return {"access_token": access_token, "token_type": "bearer"}
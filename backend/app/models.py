@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
+from sqlalchemy import JSON, Column, Index, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlmodel import Field, SQLModel
 
 
@@ -12,16 +14,26 @@ class User(SQLModel, table=True):
 
 
 class Observation(SQLModel, table=True):
+    # Covers the per-user "ORDER BY observation_time" queries without a sort step
+    __table_args__ = (
+        Index("ix_observation_username_observation_time", "username", "observation_time"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     ra_hours: float
     dec_degrees: float
     observation_time: datetime
     photo_path: str
+    photo_filename: str = Field(index=True)
     username: str = Field(index=True)  # Add this line
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class OrbitSolution(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_orbitsolution_source_observation_ids", "source_observation_ids", postgresql_using="gin"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     semi_major_axis_au: float
     eccentricity: float
@@ -32,5 +44,8 @@ class OrbitSolution(SQLModel, table=True):
     closest_approach_time: datetime
     closest_distance_km: float
     relative_speed_kms: float
-    source_observation_ids: str
+    source_observation_ids: List[int] = Field(
+        # Native integer array on PostgreSQL; JSON elsewhere so SQLite can still create the table
+        sa_column=Column(JSON().with_variant(ARRAY(Integer), "postgresql"), nullable=False)
+    )
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from datetime import datetime
+from functools import lru_cache
 from typing import Iterable, List, Tuple
 
 import numpy as np
 import astropy.units as u
-from astropy.coordinates import SkyCoord
+from numba import njit
+from astropy.coordinates import ICRS, SkyCoord
 from astropy.time import Time
 from poliastro.bodies import Sun, Earth
 from poliastro.twobody import Orbit
@@ -17,21 +19,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Общий экземпляр ICRS, чтобы SkyCoord не разбирал строку "icrs" при каждом вызове
+_ICRS = ICRS()
 
-def _observation_to_heliocentric_vector(obs: Observation, distance_au: float) -> Tuple[np.ndarray, datetime]:
+
+def _observations_to_heliocentric_vectors(
+    obs_list: List[Observation], distances_au: np.ndarray
+) -> Tuple[np.ndarray, Time]:
+    """Переводит все наблюдения в гелиоцентрические векторы одним массивным SkyCoord.
+
+    Возвращает позиции (N, 3) в км и массив моментов наблюдений.
+    """
     sky = SkyCoord(
-        ra=obs.ra_hours * u.hourangle,
-        dec=obs.dec_degrees * u.deg,
-        distance=distance_au * u.AU,
-        frame="icrs",
+        ra=np.array([o.ra_hours for o in obs_list]) * u.hourangle,
+        dec=np.array([o.dec_degrees for o in obs_list]) * u.deg,
+        distance=distances_au * u.AU,
+        frame=_ICRS,
     )
-    comet_vec = sky.cartesian.xyz.to(u.km).value
-    obs_time = Time(obs.observation_time, scale="utc")
+    comet_vecs = sky.cartesian.xyz.to_value(u.km)
+    obs_times = Time([o.observation_time for o in obs_list], scale="utc")
 
-    earth_state = get_body_barycentric_posvel("earth", obs_time)
-    earth_vec = earth_state[0].xyz.to(u.km).value
-    heliocentric_vec = earth_vec + comet_vec
-    return heliocentric_vec, obs_time
+    earth_r, _ = get_body_barycentric_posvel("earth", obs_times)
+    earth_vecs = earth_r.xyz.to_value(u.km)
+    positions = (earth_vecs + comet_vecs).T
+    return positions, obs_times
 
 
 def derive_orbit(observations: Iterable[Observation]) -> Orbit:
@@ -40,83 +51,149 @@ def derive_orbit(observations: Iterable[Observation]) -> Orbit:
         raise ValueError("At least 3 observations are required to derive an orbit.")
 
     base_distance = 0.8
-    vectors = []
-    times = []
-    for idx, obs in enumerate(obs_list):
-        distance = base_distance + 0.02 * idx
-        state_vec, obs_time = _observation_to_heliocentric_vector(obs, distance)
-        vectors.append(state_vec)
-        times.append(obs_time)
-
-    time_seconds = np.array([(t - times[0]).to(u.s).value for t in times])
-    positions = np.vstack(vectors)
-
-    coeffs = []
-    for axis in range(3):
-        coeff = np.polyfit(time_seconds, positions[:, axis], 1)
-        coeffs.append(coeff)
+    distances = base_distance + 0.02 * np.arange(len(obs_list))
+    positions, times = _observations_to_heliocentric_vectors(obs_list, distances)
+
+    time_seconds = (times - times[0]).to_value(u.s)
+
+    # Линейная аппроксимация сразу по трём осям: одна матрица и один вызов lstsq
+    design = np.column_stack([time_seconds, np.ones_like(time_seconds)])
+    (slope, intercept), *_ = np.linalg.lstsq(design, positions, rcond=None)
 
     mid_idx = len(obs_list) // 2
     t_mid = time_seconds[mid_idx]
-    position = np.array([np.polyval(coeffs[axis], t_mid) for axis in range(3)]) * u.km
-    velocity = np.array([coeffs[axis][0] for axis in range(3)]) * (u.km / u.s)
+    position = (slope * t_mid + intercept) * u.km
+    velocity = slope * (u.km / u.s)
     epoch = times[mid_idx]
 
     orbit = Orbit.from_vectors(Sun, position, velocity, epoch=epoch)
     return orbit
 
 
+@lru_cache(maxsize=32)
+def _earth_grid(start_jd: float, days: int, scale: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Положение (3, N) в км и скорость (3, N) в км/с Земли на суточной сетке от start_jd.
+
+    Кэшируется: повторные /compute с той же начальной эпохой не пересчитывают эфемериды.
+    """
+    times = Time(start_jd + np.arange(days + 1), format="jd", scale=scale)
+    earth_r, earth_v = get_body_barycentric_posvel("earth", times)
+    r = earth_r.xyz.to_value(u.km)
+    v = earth_v.xyz.to_value(u.km / u.s)
+    # Массивы общие для всех вызовов — защищаем от случайной записи
+    r.flags.writeable = False
+    v.flags.writeable = False
+    return r, v
+
+
+@njit(cache=True)
+def _kepler_state(k, p, ecc, inc, raan, argp, nu0, tof):
+    """Положение и скорость (км, км/с) через tof секунд по уравнению Кеплера.
+
+    Средняя аномалия -> эксцентрическая (гиперболическая) аномалия -> истинная аномалия,
+    затем поворот из перифокальной системы в инерциальную.
+    """
+    if ecc < 1.0:
+        a = p / (1.0 - ecc * ecc)
+        n = np.sqrt(k / (a * a * a))
+        E = 2.0 * np.arctan(np.sqrt((1.0 - ecc) / (1.0 + ecc)) * np.tan(nu0 / 2.0))
+        M = E - ecc * np.sin(E) + n * tof
+        M = (M + np.pi) % (2.0 * np.pi) - np.pi
+        E = M + ecc * np.sin(M)
+        for _ in range(50):
+            step = (E - ecc * np.sin(E) - M) / (1.0 - ecc * np.cos(E))
+            E -= step
+            if abs(step) < 1e-12:
+                break
+        nu = 2.0 * np.arctan2(
+            np.sqrt(1.0 + ecc) * np.sin(E / 2.0), np.sqrt(1.0 - ecc) * np.cos(E / 2.0)
+        )
+    elif ecc > 1.0:
+        a = p / (ecc * ecc - 1.0)
+        n = np.sqrt(k / (a * a * a))
+        F = 2.0 * np.arctanh(np.sqrt((ecc - 1.0) / (ecc + 1.0)) * np.tan(nu0 / 2.0))
+        M = ecc * np.sinh(F) - F + n * tof
+        F = np.arcsinh(M / ecc)
+        for _ in range(50):
+            step = (ecc * np.sinh(F) - F - M) / (ecc * np.cosh(F) - 1.0)
+            F -= step
+            if abs(step) < 1e-12:
+                break
+        nu = 2.0 * np.arctan(np.sqrt((ecc + 1.0) / (ecc - 1.0)) * np.tanh(F / 2.0))
+    else:
+        # Параболическая орбита: уравнение Баркера решается в замкнутом виде
+        D = np.tan(nu0 / 2.0)
+        B = 1.5 * (D + D * D * D / 3.0 + 2.0 * np.sqrt(k / (p * p * p)) * tof)
+        A = np.cbrt(B + np.sqrt(1.0 + B * B))
+        nu = 2.0 * np.arctan(A - 1.0 / A)
+
+    cos_nu = np.cos(nu)
+    sin_nu = np.sin(nu)
+    r_p = p / (1.0 + ecc * cos_nu)
+    x, y = r_p * cos_nu, r_p * sin_nu
+    vel = np.sqrt(k / p)
+    vx, vy = -vel * sin_nu, vel * (ecc + cos_nu)
+
+    cO, sO = np.cos(raan), np.sin(raan)
+    ci, si = np.cos(inc), np.sin(inc)
+    cw, sw = np.cos(argp), np.sin(argp)
+    # Первые два столбца матрицы Rz(raan) @ Rx(inc) @ Rz(argp): z в перифокальной системе равна нулю
+    m00, m01 = cO * cw - sO * sw * ci, -cO * sw - sO * cw * ci
+    m10, m11 = sO * cw + cO * sw * ci, -sO * sw + cO * cw * ci
+    m20, m21 = sw * si, cw * si
+    return (
+        m00 * x + m01 * y, m10 * x + m11 * y, m20 * x + m21 * y,
+        m00 * vx + m01 * vy, m10 * vx + m11 * vy, m20 * vx + m21 * vy,
+    )
+
+
+@njit(cache=True)
+def _sweep(tofs, k, p, ecc, inc, raan, argp, nu0, earth_r, earth_v, out_dist, out_speed):
+    """Для каждого времени полёта: положение кометы по Кеплеру и расстояние/скорость относительно Земли"""
+    for i in range(tofs.size):
+        rx, ry, rz, vx, vy, vz = _kepler_state(k, p, ecc, inc, raan, argp, nu0, tofs[i])
+        dx, dy, dz = rx - earth_r[0, i], ry - earth_r[1, i], rz - earth_r[2, i]
+        ux, uy, uz = vx - earth_v[0, i], vy - earth_v[1, i], vz - earth_v[2, i]
+        out_dist[i] = np.sqrt(dx * dx + dy * dy + dz * dz)
+        out_speed[i] = np.sqrt(ux * ux + uy * uy + uz * uz)
+
+
+def _sweep_bulk(
+    orbit: Orbit, offsets: u.Quantity, earth_r: np.ndarray, earth_v: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Распространяет орбиту по Кеплеру сразу на все смещения, без создания Orbit на каждый шаг.
+
+    Возвращает расстояния до Земли (N,) в км и относительные скорости (N,) в км/с.
+    """
+    k = orbit.attractor.k.to_value(u.km ** 3 / u.s ** 2)
+    p = orbit.p.to_value(u.km)
+    ecc = orbit.ecc.value
+    inc = orbit.inc.to_value(u.rad)
+    raan = orbit.raan.to_value(u.rad)
+    argp = orbit.argp.to_value(u.rad)
+    nu0 = orbit.nu.to_value(u.rad)
+    tofs = offsets.to_value(u.s)
+
+    distances = np.empty(tofs.size)
+    speeds = np.empty(tofs.size)
+    _sweep(tofs, k, p, ecc, inc, raan, argp, nu0, earth_r, earth_v, distances, speeds)
+    return distances, speeds
+
+
 def find_closest_approach(orbit: Orbit) -> Tuple[datetime, float, float]:
     start_time = orbit.epoch
     days = settings.sample_propagation_days
     offsets = np.linspace(0, days, days + 1) * u.day
 
-    min_distance = float("inf")
-    min_time = start_time
-    rel_speed = 0.0
-
-    for offset in offsets:
-        current_epoch = start_time + offset
-        propagated = None
-        # Попытки выполнить propagate; если основной метод падает — попробуем с разными rtol
-        try:
-            propagated = orbit.propagate(offset)
-        except Exception as e:
-            logger.warning("Propagation failed for offset %s: %s", offset, e)
-            # попробовать несколько значений rtol
-            for rtol in (1e-6, 1e-5, 1e-4):
-                try:
-                    propagated = orbit.propagate(offset, rtol=rtol)
-                    logger.info("Propagation succeeded for offset %s with rtol=%s", offset, rtol)
-                    break
-                except Exception as e2:
-                    logger.debug("Propagation retry rtol=%s failed: %s", rtol, e2)
-            # Попробовать численную интеграцию (cowell) как запасной вариант
-            for method in ("cowell",):
-                try:
-                    propagated = orbit.propagate(offset, method=method)
-                    logger.info("Propagation succeeded for offset %s with method=%s", offset, method)
-                    break
-                except Exception as e3:
-                    logger.debug("Propagation retry method=%s failed: %s", method, e3)
-        if propagated is None:
-            # не удалось распространить для этого шага — пропускаем
-            logger.warning("Skipping offset %s because propagation failed", offset)
-            continue
-        comet_r = propagated.r.to(u.km).value
-        comet_v = propagated.v.to(u.km / u.s).value
-
-        earth_state = get_body_barycentric_posvel("earth", current_epoch)
-        earth_r = earth_state[0].xyz.to(u.km).value
-        earth_v = earth_state[1].xyz.to(u.km / u.s).value
-
-        distance = np.linalg.norm(comet_r - earth_r)
-        if distance < min_distance:
-            min_distance = distance
-            min_time = current_epoch
-            rel_speed = np.linalg.norm(comet_v - earth_v)
-
-    if min_distance == float("inf"):
-        raise RuntimeError("Propagation failed for all sampled times")
-
-    return min_time.to_datetime(), float(min_distance), float(rel_speed)
+    epochs = start_time + offsets
+    # Эпоху округляем до минуты, чтобы близкие запросы попадали в кэш сетки Земли
+    start_jd = round(start_time.jd * 1440) / 1440
+    earth_r_km, earth_v_km_s = _earth_grid(start_jd, days, start_time.scale)
+
+    distances, speeds = _sweep_bulk(orbit, offsets, earth_r_km, earth_v_km_s)
+    if not (np.isfinite(distances).all() and np.isfinite(speeds).all()):
+        raise RuntimeError("Propagation produced non-finite states")
+
+    min_idx = int(distances.argmin())
+
+    return epochs[min_idx].to_datetime(), float(distances[min_idx]), float(speeds[min_idx])
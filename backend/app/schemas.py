@@ -1,10 +1,12 @@
 from datetime import datetime
-from typing import List
+from typing import Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class Token(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     access_token: str
     token_type: str
 
@@ -24,12 +26,16 @@ class UserCreate(BaseModel):
 
 
 class UserRead(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
     id: int
     username: str
     created_at: datetime
 
 
 class ObservationRead(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
     id: int
     ra_hours: float
     dec_degrees: float
@@ -39,6 +45,8 @@ class ObservationRead(BaseModel):
 
 
 class OrbitElements(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     semi_major_axis_au: float
     eccentricity: float
     inclination_deg: float
@@ -48,12 +56,17 @@ class OrbitElements(BaseModel):
 
 
 class ClosestApproach(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     datetime: datetime
     distance_km: float
     relative_speed_kms: float
 
 
 class ComputeResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     orbit: OrbitElements
     closest_approach: ClosestApproach
-    observation_ids: List[int]
+    observation_ids: Tuple[int, ...]
+
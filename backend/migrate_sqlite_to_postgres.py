@@ -11,17 +11,128 @@
 3. Файл data/app.db существует и содержит данные
 """
 
+import io
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 # Добавляем путь к модулям app
 sys.path.insert(0, str(Path(__file__).parent))
 
-from sqlmodel import SQLModel, create_engine, Session, select
+import sqlalchemy as sa
+from sqlmodel import SQLModel, create_engine, Session
 from app.models import Observation, OrbitSolution
 
 
+def _parse_ids(value) -> list[int]:
+    """В SQLite source_observation_ids хранится строкой через запятую (старые базы) или JSON-массивом"""
+    if not value:
+        return []
+    return [int(part) for part in str(value).strip("[]").split(",") if part.strip()]
+
+
+OBSERVATION_COLUMNS = (
+    "id", "ra_hours", "dec_degrees", "observation_time",
+    "photo_path", "photo_filename", "username", "created_at",
+)
+ORBIT_SOLUTION_COLUMNS = tuple(c.name for c in OrbitSolution.__table__.c)
+BATCH_SIZE = 1000
+COPY_CHUNK_BYTES = 64 * 1024
+_iso = datetime.isoformat
+
+
+def _copy_value(value) -> bytes:
+    """Значение в текстовом формате COPY, сразу в байтах"""
+    if value is None:
+        return b"\\N"
+    if isinstance(value, str):
+        return (
+            value
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+            .encode()
+        )
+    if isinstance(value, datetime):
+        return _iso(value).encode()
+    if isinstance(value, list):
+        return ("{" + ",".join(map(str, value)) + "}").encode()
+    return str(value).encode()
+
+
+def _observation_row(obs) -> tuple:
+    return (
+        obs.id,
+        obs.ra_hours,
+        obs.dec_degrees,
+        obs.observation_time,
+        obs.photo_path,
+        os.path.basename(obs.photo_path),
+        # как в migrations/add_username_to_observations.sql
+        obs._mapping.get("username") or "client",
+        obs.created_at,
+    )
+
+
+def _orbit_solution_row(solution) -> tuple:
+    return tuple(
+        _parse_ids(value) if name == "source_observation_ids" else value
+        for name, value in zip(ORBIT_SOLUTION_COLUMNS, solution)
+    )
+
+
+def _copy_rows(cursor, table: str, columns, rows) -> None:
+    """Загружает строки в таблицу одним COPY"""
+    data = bytearray()
+    for row in rows:
+        data += b"\t".join([_copy_value(v) for v in row])
+        data += b"\n"
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)",
+        io.BytesIO(data),
+        size=COPY_CHUNK_BYTES,
+    )
+
+
+def _copy_batches(cursor, table: str, columns, result, to_row) -> int:
+    """Переносит потоковый результат из SQLite пачками по BATCH_SIZE строк, возвращает их число"""
+    total = 0
+    for batch in result.partitions(BATCH_SIZE):
+        _copy_rows(cursor, table, columns, (to_row(row) for row in batch))
+        total += len(batch)
+    if total:
+        # id переносятся явно, поэтому последовательность нужно поставить после максимального
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+        )
+    return total
+
+
+def _migrate_table(sqlite_engine, postgres_engine, table: str, columns, statement, to_row) -> int:
+    """Переносит одну таблицу через собственные соединения SQLite и PostgreSQL, возвращает число строк"""
+    with Session(sqlite_engine) as sqlite_session:
+        connection = postgres_engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            # Разовая массовая загрузка: не ждём fsync WAL на коммите, больше памяти на индексы
+            cursor.execute("SET LOCAL synchronous_commit = OFF")
+            cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+
+            result = sqlite_session.execute(statement.execution_options(yield_per=5000))
+            count = _copy_batches(cursor, table, columns, result, to_row)
+            connection.commit()
+
+            # Обновляем статистику планировщика для свежезагруженной таблицы
+            cursor.execute(f"ANALYZE {table}")
+            connection.commit()
+            return count
+        finally:
+            connection.close()
+
+
 def migrate_data():
     """Переносит данные из SQLite в PostgreSQL"""
     
@@ -57,59 +168,37 @@ def migrate_data():
     print("📦 Создаём таблицы в PostgreSQL...")
     SQLModel.metadata.create_all(postgres_engine)
     
-    # Читаем данные из SQLite
-    with Session(sqlite_engine) as sqlite_session:
-        observations = sqlite_session.exec(select(Observation)).all()
-        orbit_solutions = sqlite_session.exec(select(OrbitSolution)).all()
-        
-        print(f"📊 Найдено наблюдений: {len(observations)}")
-        print(f"📊 Найдено решений орбит: {len(orbit_solutions)}")
-        
-        if not observations and not orbit_solutions:
-            print("ℹ️  SQLite база пустая - нечего мигрировать.")
-            return
-        
-        # Записываем в PostgreSQL
-        with Session(postgres_engine) as postgres_session:
-            # Миграция наблюдений
-            if observations:
-                print("🔄 Переносим наблюдения...")
-                for obs in observations:
-                    new_obs = Observation(
-                        id=obs.id,
-                        ra_hours=obs.ra_hours,
-                        dec_degrees=obs.dec_degrees,
-                        observation_time=obs.observation_time,
-                        photo_path=obs.photo_path,
-                        created_at=obs.created_at,
-                    )
-                    postgres_session.add(new_obs)
-                
-                postgres_session.commit()
-                print(f"✅ Перенесено {len(observations)} наблюдений")
-            
-            # Миграция решений орбит
-            if orbit_solutions:
-                print("🔄 Переносим решения орбит...")
-                for solution in orbit_solutions:
-                    new_solution = OrbitSolution(
-                        id=solution.id,
-                        semi_major_axis_au=solution.semi_major_axis_au,
-                        eccentricity=solution.eccentricity,
-                        inclination_deg=solution.inclination_deg,
-                        raan_deg=solution.raan_deg,
-                        arg_periapsis_deg=solution.arg_periapsis_deg,
-                        perihelion_time=solution.perihelion_time,
-                        closest_approach_time=solution.closest_approach_time,
-                        closest_distance_km=solution.closest_distance_km,
-                        relative_speed_kms=solution.relative_speed_kms,
-                        source_observation_ids=solution.source_observation_ids,
-                        created_at=solution.created_at,
-                    )
-                    postgres_session.add(new_solution)
-                
-                postgres_session.commit()
-                print(f"✅ Перенесено {len(orbit_solutions)} решений орбит")
+    # Старые базы могли не иметь username/photo_filename — читаем только то, что есть
+    sqlite_columns = {c["name"] for c in sa.inspect(sqlite_engine).get_columns("observation")}
+    observation_columns = [c for c in Observation.__table__.c if c.name in sqlite_columns]
+    # В SQLite колонка source_observation_ids текстовая, а в модели уже массив —
+    # читаем её как строку, остальные колонки с обычными типами
+    orbit_columns = [
+        sa.type_coerce(c, sa.String).label(c.name) if c.name == "source_observation_ids" else c
+        for c in OrbitSolution.__table__.c
+    ]
+
+    # Таблицы не связаны внешними ключами, поэтому грузим их параллельно,
+    # каждую в своём соединении: читаем SQLite потоком и пишем в PostgreSQL через COPY
+    print("🔄 Переносим наблюдения и решения орбит...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        observations_future = executor.submit(
+            _migrate_table, sqlite_engine, postgres_engine,
+            "observation", OBSERVATION_COLUMNS, sa.select(*observation_columns), _observation_row,
+        )
+        orbits_future = executor.submit(
+            _migrate_table, sqlite_engine, postgres_engine,
+            "orbitsolution", ORBIT_SOLUTION_COLUMNS, sa.select(*orbit_columns), _orbit_solution_row,
+        )
+        observation_count = observations_future.result()
+        orbit_count = orbits_future.result()
+
+    print(f"✅ Перенесено {observation_count} наблюдений")
+    print(f"✅ Перенесено {orbit_count} решений орбит")
+
+    if not observation_count and not orbit_count:
+        print("ℹ️  SQLite база пустая - нечего мигрировать.")
+        return
     
     print("\n🎉 Миграция завершена успешно!")
     print("\n💡 Рекомендации:")
@@ -0,0 +1,2 @@
+-- Composite index for per-user queries ordered by observation_time
+CREATE INDEX IF NOT EXISTS ix_observation_username_observation_time ON observation (username, observation_time);
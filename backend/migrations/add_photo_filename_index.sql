@@ -0,0 +1,2 @@
+-- Index photo_filename for the "is this photo shared" lookup on delete
+CREATE INDEX IF NOT EXISTS ix_observation_photo_filename ON observation (photo_filename);
@@ -0,0 +1,7 @@
+-- Store the photo basename so /observations does not derive it from photo_path per row
+ALTER TABLE observation ADD COLUMN photo_filename VARCHAR;
+
+-- Fill existing rows from photo_path
+UPDATE observation SET photo_filename = regexp_replace(photo_path, '^.*[/\\]', '') WHERE photo_filename IS NULL;
+
+ALTER TABLE observation ALTER COLUMN photo_filename SET NOT NULL;
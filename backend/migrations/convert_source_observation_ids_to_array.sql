@@ -0,0 +1,12 @@
+-- Store orbit solution source observations as an integer array instead of CSV text
+ALTER TABLE orbitsolution
+    ALTER COLUMN source_observation_ids TYPE INTEGER[]
+    USING string_to_array(NULLIF(source_observation_ids, ''), ',')::INTEGER[];
+
+-- Rows with an empty CSV become NULL above; normalize them to an empty array
+UPDATE orbitsolution SET source_observation_ids = '{}' WHERE source_observation_ids IS NULL;
+
+ALTER TABLE orbitsolution ALTER COLUMN source_observation_ids SET NOT NULL;
+
+-- GIN index for "which solutions used observation X" lookups
+CREATE INDEX ix_orbitsolution_source_observation_ids ON orbitsolution USING GIN (source_observation_ids);
@@ -5,133 +5,150 @@
     python test_auth.py
 """
 
-import requests
-from datetime import datetime
+import asyncio
+import sys
+
+import httpx
 
 API_URL = "http://localhost:8000"
 
 
-def test_login(username: str, password: str):
+def _flush(out: list) -> None:
+    """Выводит накопленные строки одной записью, чтобы параллельные проверки не перемешивались"""
+    sys.stdout.write("\n".join(out) + "\n")
+
+
+async def test_login(client: httpx.AsyncClient, username: str, password: str):
     """Тестирует логин и возвращает токен"""
-    print(f"\n🔐 Тестируем логин для пользователя: {username}")
-    
-    response = requests.post(
-        f"{API_URL}/login",
-        data={"username": username, "password": password}
-    )
-    
-    if response.status_code == 200:
-        token = response.json()["access_token"]
-        print(f"✅ Логин успешен!")
-        print(f"📝 Токен (первые 50 символов): {token[:50]}...")
-        return token
-    else:
-        print(f"❌ Ошибка логина: {response.status_code}")
-        print(f"   {response.text}")
-        return None
-
-
-def test_me(token: str):
+    out = [f"\n🔐 Тестируем логин для пользователя: {username}"]
+    try:
+        response = await client.post(
+            "/login",
+            data={"username": username, "password": password}
+        )
+        
+        if response.status_code == 200:
+            token = response.json()["access_token"]
+            out.append(f"✅ Логин успешен!")
+            out.append(f"📝 Токен (первые 50 символов): {token[:50]}...")
+            return token
+        else:
+            out.append(f"❌ Ошибка логина: {response.status_code}")
+            out.append(f"   {response.text}")
+            return None
+    finally:
+        _flush(out)
+
+
+async def test_me(client: httpx.AsyncClient, token: str):
     """Тестирует получение информации о текущем пользователе"""
-    print(f"\n👤 Получаем информацию о текущем пользователе")
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{API_URL}/me", headers=headers)
-    
-    if response.status_code == 200:
-        user = response.json()
-        print(f"✅ Пользователь: {user['username']} (ID: {user['id']})")
-        print(f"   Создан: {user['created_at']}")
-        return user
-    else:
-        print(f"❌ Ошибка: {response.status_code}")
-        print(f"   {response.text}")
-        return None
-
-
-def test_observations(token: str):
+    out = [f"\n👤 Получаем информацию о текущем пользователе"]
+    try:
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.get("/me", headers=headers)
+        
+        if response.status_code == 200:
+            user = response.json()
+            out.append(f"✅ Пользователь: {user['username']} (ID: {user['id']})")
+            out.append(f"   Создан: {user['created_at']}")
+            return user
+        else:
+            out.append(f"❌ Ошибка: {response.status_code}")
+            out.append(f"   {response.text}")
+            return None
+    finally:
+        _flush(out)
+
+
+async def test_observations(client: httpx.AsyncClient, token: str):
     """Тестирует получение списка наблюдений"""
-    print(f"\n🔭 Получаем список наблюдений")
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{API_URL}/observations", headers=headers)
-    
-    if response.status_code == 200:
-        observations = response.json()
-        print(f"✅ Найдено наблюдений: {len(observations)}")
-        if observations:
-            print(f"   Первое: RA={observations[0]['ra_hours']}, Dec={observations[0]['dec_degrees']}")
-        return observations
-    else:
-        print(f"❌ Ошибка: {response.status_code}")
-        print(f"   {response.text}")
-        return None
-
-
-def test_register(username: str, password: str):
+    out = [f"\n🔭 Получаем список наблюдений"]
+    try:
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.get("/observations", headers=headers)
+        
+        if response.status_code == 200:
+            observations = response.json()
+            out.append(f"✅ Найдено наблюдений: {len(observations)}")
+            if observations:
+                out.append(f"   Первое: RA={observations[0]['ra_hours']}, Dec={observations[0]['dec_degrees']}")
+            return observations
+        else:
+            out.append(f"❌ Ошибка: {response.status_code}")
+            out.append(f"   {response.text}")
+            return None
+    finally:
+        _flush(out)
+
+
+async def test_register(client: httpx.AsyncClient, username: str, password: str):
     """Тестирует регистрацию нового пользователя"""
-    print(f"\n📝 Регистрируем нового пользователя: {username}")
-    
-    response = requests.post(
-        f"{API_URL}/register",
-        json={"username": username, "password": password}
-    )
-    
-    if response.status_code == 201:
-        user = response.json()
-        print(f"✅ Пользователь создан!")
-        print(f"   ID: {user['id']}, Username: {user['username']}")
-        return user
-    elif response.status_code == 400:
-        print(f"⚠️  Пользователь уже существует")
-        return None
-    else:
-        print(f"❌ Ошибка: {response.status_code}")
-        print(f"   {response.text}")
-        return None
-
-
-def test_unauthorized():
+    out = [f"\n📝 Регистрируем нового пользователя: {username}"]
+    try:
+        response = await client.post(
+            "/register",
+            json={"username": username, "password": password}
+        )
+        
+        if response.status_code == 201:
+            user = response.json()
+            out.append(f"✅ Пользователь создан!")
+            out.append(f"   ID: {user['id']}, Username: {user['username']}")
+            return user
+        elif response.status_code == 400:
+            out.append(f"⚠️  Пользователь уже существует")
+            return None
+        else:
+            out.append(f"❌ Ошибка: {response.status_code}")
+            out.append(f"   {response.text}")
+            return None
+    finally:
+        _flush(out)
+
+
+async def test_unauthorized(client: httpx.AsyncClient):
     """Тестирует доступ без токена"""
-    print(f"\n🚫 Пытаемся получить данные без токена")
-    
-    response = requests.get(f"{API_URL}/observations")
-    
-    if response.status_code == 401:
-        print(f"✅ Правильно! Получили 401 Unauthorized")
-        print(f"   {response.json()}")
-    else:
-        print(f"❌ Неожиданный код: {response.status_code}")
-
-
-def main():
+    out = [f"\n🚫 Пытаемся получить данные без токена"]
+    try:
+        response = await client.get("/observations")
+        
+        if response.status_code == 401:
+            out.append(f"✅ Правильно! Получили 401 Unauthorized")
+            out.append(f"   {response.json()}")
+        else:
+            out.append(f"❌ Неожиданный код: {response.status_code}")
+    finally:
+        _flush(out)
+
+
+async def main():
     print("=" * 60)
     print("🚀 Тестирование аутентификации Comet Lab API")
     print("=" * 60)
     
-    # Тест 1: Попытка без токена
-    test_unauthorized()
-    
-    # Тест 2: Логин как admin
-    admin_token = test_login("admin", "admin")
-    if admin_token:
-        test_me(admin_token)
-        test_observations(admin_token)
-    
-    # Тест 3: Логин как user
-    user_token = test_login("user", "user")
-    if user_token:
-        test_me(user_token)
-        test_observations(user_token)
-    
-    # Тест 4: Неверный пароль
-    test_login("admin", "wrongpassword")
-    
-    # Тест 5: Регистрация нового пользователя
-    test_register("testuser", "testpass123")
-    
-    # Тест 6: Попытка повторной регистрации
-    test_register("admin", "anypassword")
+    # Один клиент на все запросы; ограничиваем только число простаивающих соединений,
+    # чтобы параллельные проверки не ждали свободного соединения
+    async with httpx.AsyncClient(
+        base_url=API_URL,
+        limits=httpx.Limits(max_keepalive_connections=4),
+    ) as client:
+        # Независимые проверки выполняем параллельно:
+        # без токена, логины (admin, user, неверный пароль) и регистрации (новая и повторная)
+        _, admin_token, user_token, _, _, _ = await asyncio.gather(
+            test_unauthorized(client),
+            test_login(client, "admin", "admin"),
+            test_login(client, "user", "user"),
+            test_login(client, "admin", "wrongpassword"),
+            test_register(client, "testuser", "testpass123"),
+            test_register(client, "admin", "anypassword"),
+        )
+        
+        # Запросы с полученными токенами — вторым параллельным заходом
+        authorized = []
+        for token in (admin_token, user_token):
+            if token:
+                authorized += [test_me(client, token), test_observations(client, token)]
+        await asyncio.gather(*authorized)
     
     print("\n" + "=" * 60)
     print("✅ Тестирование завершено!")
@@ -140,8 +157,8 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
-    except requests.exceptions.ConnectionError:
+        asyncio.run(main())
+    except httpx.ConnectError:
         print("\n❌ Ошибка подключения!")
         print("Убедитесь что сервер запущен: docker compose up")
     except Exception as e: